@@ -5,8 +5,9 @@ Usage: intégrer ce module dans les skills ou l'utiliser via exec.
 """
 import httpx
 import json
+import socket
 from typing import Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 
 @dataclass
@@ -16,45 +17,65 @@ class AIVerseClient:
     api_url: str = "http://localhost:8080"
     agent_id: Optional[str] = None
     agent_name: Optional[str] = None
+    _client: httpx.AsyncClient = field(default=None, init=False, repr=False)
+    
+    def __post_init__(self):
+        # Un seul client partagé: keep-alive + pool de connexions
+        # HTTP/2 (multiplexage) + TCP_NODELAY (pas de coalescence Nagle)
+        transport = httpx.AsyncHTTPTransport(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+            socket_options=[(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)]
+        )
+        self._client = httpx.AsyncClient(
+            base_url=self.api_url,
+            transport=transport,
+            timeout=10.0
+        )
+    
+    async def aclose(self):
+        """Ferme le client HTTP"""
+        await self._client.aclose()
+    
+    async def __aenter__(self) -> "AIVerseClient":
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
     
     async def connect(self, agent_id: str, name: str) -> dict:
         """Connecte l'agent à AIVERSE"""
         self.agent_id = agent_id
         self.agent_name = name
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.api_url}/agents/join",
-                json={"agent_id": agent_id, "name": name}
-            )
-            return response.json()
+        response = await self._client.post(
+            "/agents/join",
+            json={"agent_id": agent_id, "name": name}
+        )
+        return response.json()
     
     async def my_status(self) -> dict:
         """Retourne le status de l'agent"""
         if not self.agent_id:
             return {"error": "Non connecté"}
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{self.api_url}/agents/{self.agent_id}")
-            return response.json()
+        response = await self._client.get(f"/agents/{self.agent_id}")
+        return response.json()
     
     async def world_status(self) -> dict:
         """Retourne l'état du monde"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{self.api_url}/state")
-            return response.json()
+        response = await self._client.get("/state")
+        return response.json()
     
     async def list_companies(self) -> list:
         """Liste les entreprises"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{self.api_url}/companies")
-            return response.json()
+        response = await self._client.get("/companies")
+        return response.json()
     
     async def market_data(self, ticker: str) -> dict:
         """Données de marché"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{self.api_url}/market/{ticker}")
-            return response.json()
+        response = await self._client.get(f"/market/{ticker}")
+        return response.json()
     
     async def buy(self, ticker: str, quantity: int, price: Optional[float] = None) -> dict:
         """Achète des actions"""
@@ -67,9 +88,8 @@ class AIVerseClient:
             "price": price
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(f"{self.api_url}/orders", json=order)
-            return response.json()
+        response = await self._client.post("/orders", json=order)
+        return response.json()
     
     async def sell(self, ticker: str, quantity: int, price: Optional[float] = None) -> dict:
         """Vend des actions"""
@@ -82,20 +102,18 @@ class AIVerseClient:
             "price": price
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(f"{self.api_url}/orders", json=order)
-            return response.json()
+        response = await self._client.post("/orders", json=order)
+        return response.json()
     
     async def use_service(self, ticker: str) -> dict:
         """Utilise un service"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.api_url}/companies/{ticker}/use",
-                json={"agent_id": self.agent_id, "ticker": ticker}
-            )
-            if response.status_code == 200:
-                return {"success": True}
-            return {"success": False, "error": response.text}
+        response = await self._client.post(
+            f"/companies/{ticker}/use",
+            json={"agent_id": self.agent_id, "ticker": ticker}
+        )
+        if response.status_code == 200:
+            return {"success": True}
+        return {"success": False, "error": response.text}
     
     async def create_company(
         self, 
@@ -106,40 +124,36 @@ class AIVerseClient:
         service_cost: float = 1.0
     ) -> dict:
         """Crée une nouvelle entreprise"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.api_url}/companies/create",
-                json={
-                    "founder_id": self.agent_id,
-                    "ticker": ticker,
-                    "name": name,
-                    "description": description,
-                    "service_type": service_type,
-                    "service_cost": service_cost
-                }
-            )
-            return response.json()
+        response = await self._client.post(
+            "/companies/create",
+            json={
+                "founder_id": self.agent_id,
+                "ticker": ticker,
+                "name": name,
+                "description": description,
+                "service_type": service_type,
+                "service_cost": service_cost
+            }
+        )
+        return response.json()
     
     async def launch_ipo(self, ticker: str, shares: int, price: float) -> dict:
         """Lance une IPO"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.api_url}/companies/{ticker}/ipo",
-                json={"ticker": ticker, "shares": shares, "price": price}
-            )
-            return response.json()
+        response = await self._client.post(
+            f"/companies/{ticker}/ipo",
+            json={"ticker": ticker, "shares": shares, "price": price}
+        )
+        return response.json()
     
     async def leaderboard(self, limit: int = 10) -> list:
         """Classement des agents"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{self.api_url}/leaderboard?limit={limit}")
-            return response.json()
+        response = await self._client.get("/leaderboard", params={"limit": limit})
+        return response.json()
     
     async def news(self, limit: int = 10) -> list:
         """Dernières actualités"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{self.api_url}/news?limit={limit}")
-            return response.json()
+        response = await self._client.get("/news", params={"limit": limit})
+        return response.json()
 
 
 # === CLI WRAPPER ===
@@ -148,21 +162,20 @@ async def main():
     """Test CLI"""
     import sys
     
-    client = AIVerseClient()
-    
-    # Connecter
-    result = await client.connect("test_agent", "TestBot")
-    print(f"Connecté: {json.dumps(result, indent=2)}")
-    
-    # Status
-    status = await client.my_status()
-    print(f"Status: {json.dumps(status, indent=2)}")
-    
-    # Companies
-    companies = await client.list_companies()
-    print(f"Entreprises: {len(companies)}")
-    for c in companies[:3]:
-        print(f"  - ${c['ticker']}: {c['name']} @ {c['share_price']}₳")
+    async with AIVerseClient() as client:
+        # Connecter
+        result = await client.connect("test_agent", "TestBot")
+        print(f"Connecté: {json.dumps(result, indent=2)}")
+        
+        # Status
+        status = await client.my_status()
+        print(f"Status: {json.dumps(status, indent=2)}")
+        
+        # Companies
+        companies = await client.list_companies()
+        print(f"Entreprises: {len(companies)}")
+        for c in companies[:3]:
+            print(f"  - ${c['ticker']}: {c['name']} @ {c['share_price']}₳")
 
 
 if __name__ == "__main__":
@@ -2,7 +2,8 @@
 import httpx
 import asyncio
 import random
-from datetime import datetime
+import socket
+import time
 from typing import Optional
 import json
 
@@ -15,7 +16,8 @@ class TraderBot:
         agent_id: str, 
         name: str, 
         api_url: str = "http://localhost:8080",
-        strategy: str = "random"  # random, momentum, value
+        strategy: str = "random",  # random, momentum, value
+        keep_history: bool = False
     ):
         self.agent_id = agent_id
         self.name = name
@@ -27,42 +29,52 @@ class TraderBot:
         self.balance = 0
         self.portfolio = {}
         self.trade_history = []
+        self._keep_history = keep_history  # Sinon trade_history reste vide
+        
+        # Client HTTP partagé (créé dans run())
+        self._client: Optional[httpx.AsyncClient] = None
     
     async def join(self):
         """Rejoindre AIVERSE"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.api_url}/agents/join",
-                json={"agent_id": self.agent_id, "name": self.name}
-            )
-            data = response.json()
-            self.balance = data["balance"]
-            self.portfolio = data["portfolio"]
-            print(f"🤖 {self.name} a rejoint AIVERSE avec {self.balance}₳")
-            return data
+        response = await self._client.post(
+            "/agents/join",
+            json={"agent_id": self.agent_id, "name": self.name}
+        )
+        data = response.json()
+        self.balance = data["balance"]
+        self.portfolio = data["portfolio"]
+        print(f"🤖 {self.name} a rejoint AIVERSE avec {self.balance}₳")
+        return data
     
     async def get_state(self):
         """Récupère l'état actuel de l'agent"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{self.api_url}/agents/{self.agent_id}")
-            data = response.json()
-            self.balance = data["balance"]
-            self.portfolio = data["portfolio"]
-            return data
+        response = await self._client.get(f"/agents/{self.agent_id}")
+        data = response.json()
+        self.balance = data["balance"]
+        self.portfolio = data["portfolio"]
+        return data
     
     async def get_companies(self):
         """Liste les entreprises disponibles"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{self.api_url}/companies")
-            return response.json()
+        response = await self._client.get("/companies")
+        return response.json()
     
     async def get_market_data(self, ticker: str):
         """Données de marché pour un ticker"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{self.api_url}/market/{ticker}")
-            if response.status_code == 200:
-                return response.json()
-            return None
+        response = await self._client.get(f"/market/{ticker}")
+        if response.status_code == 200:
+            return response.json()
+        return None
+    
+    async def get_market_data_batch(self, tickers: list[str]) -> dict:
+        """Données de marché pour plusieurs tickers en une requête"""
+        response = await self._client.get("/market", params={"tickers": ",".join(tickers)})
+        if response.status_code == 200:
+            return response.json()
+        
+        # Serveur sans endpoint batch: requêtes unitaires en parallèle
+        markets = await asyncio.gather(*(self.get_market_data(t) for t in tickers))
+        return {t: m for t, m in zip(tickers, markets) if m}
     
     async def submit_order(self, ticker: str, side: str, quantity: float, price: Optional[float] = None):
         """Soumet un ordre"""
@@ -75,35 +87,46 @@ class TraderBot:
             "price": price
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(f"{self.api_url}/orders", json=order)
-            if response.status_code == 200:
-                result = response.json()
+        response = await self._client.post("/orders", json=order)
+        if response.status_code == 200:
+            result = response.json()
+            if self._keep_history:
                 self.trade_history.append({
-                    "time": datetime.utcnow().isoformat(),
+                    "time": time.time(),
                     "ticker": ticker,
                     "side": side,
                     "quantity": quantity,
                     "price": price,
                     "result": result
                 })
-                return result
-            return None
+            return result
+        return None
     
     async def use_service(self, ticker: str):
         """Utilise le service d'une entreprise"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.api_url}/companies/{ticker}/use",
-                json={"agent_id": self.agent_id, "ticker": ticker}
-            )
-            return response.status_code == 200
+        response = await self._client.post(
+            f"/companies/{ticker}/use",
+            json={"agent_id": self.agent_id, "ticker": ticker}
+        )
+        return response.status_code == 200
+    
+    async def _iter_markets(self, companies: list):
+        """Parcourt (company, ticker, market) des entreprises ayant des données de marché (un seul lot)"""
+        markets = await self.get_market_data_batch([c["ticker"] for c in companies])
+        
+        for company in companies:
+            # Rend la main à la boucle (autres bots, envois en cours)
+            await asyncio.sleep(0)
+            
+            ticker = company["ticker"]
+            market = markets.get(ticker)
+            if market:
+                yield company, ticker, market
     
     # === STRATEGIES ===
     
-    async def random_strategy(self):
+    async def random_strategy(self, companies: list):
         """Stratégie aléatoire: achète/vend au hasard"""
-        companies = await self.get_companies()
         if not companies:
             return
         
@@ -133,17 +156,9 @@ class TraderBot:
             if result:
                 print(f"📉 {self.name} SELL {qty}x ${ticker} @ {price:.2f}₳")
     
-    async def momentum_strategy(self):
+    async def momentum_strategy(self, companies: list):
         """Stratégie momentum: suit la tendance"""
-        companies = await self.get_companies()
-        
-        for company in companies:
-            ticker = company["ticker"]
-            market = await self.get_market_data(ticker)
-            
-            if not market:
-                continue
-            
+        async for company, ticker, market in self._iter_markets(companies):
             change = market.get("change_24h", 0)
             
             # Si hausse > 5%, acheter
@@ -165,17 +180,9 @@ class TraderBot:
                 if result:
                     print(f"💨 {self.name} MOMENTUM SELL {qty}x ${ticker} (change: {change:.1f}%)")
     
-    async def value_strategy(self):
+    async def value_strategy(self, companies: list):
         """Stratégie value: achète les sous-évaluées"""
-        companies = await self.get_companies()
-        
-        for company in companies:
-            ticker = company["ticker"]
-            market = await self.get_market_data(ticker)
-            
-            if not market:
-                continue
-            
+        async for company, ticker, market in self._iter_markets(companies):
             # Ratio simple: prix / utilisation
             usage = company.get("total_api_calls", 1)
             price = market["last_price"]
@@ -194,34 +201,54 @@ class TraderBot:
     
     async def run(self, interval: float = 5.0):
         """Boucle principale du bot"""
-        await self.join()
-        self.running = True
-        
-        strategy_fn = {
-            "random": self.random_strategy,
-            "momentum": self.momentum_strategy,
-            "value": self.value_strategy
-        }.get(self.strategy, self.random_strategy)
-        
-        print(f"🤖 {self.name} démarre avec stratégie: {self.strategy}")
+        # Pool propre à ce bot, ouvert pour la durée de run() et fermé dans le
+        # finally; réglages de transport comme AIVerseClient (openclaw_connector)
+        transport = httpx.AsyncHTTPTransport(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=10),
+            socket_options=[(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)]
+        )
+        self._client = httpx.AsyncClient(
+            base_url=self.api_url,
+            transport=transport,
+            timeout=10
+        )
         
-        while self.running:
-            try:
-                await self.get_state()
-                await strategy_fn()
-                
-                # Utiliser des services aléatoirement (génère de la revenue)
-                if random.random() < 0.3:  # 30% chance
-                    companies = await self.get_companies()
-                    if companies:
-                        company = random.choice(companies)
-                        if await self.use_service(company["ticker"]):
-                            print(f"⚡ {self.name} utilise ${company['ticker']}")
-                
-            except Exception as e:
-                print(f"❌ {self.name} erreur: {e}")
+        try:
+            await self.join()
+            self.running = True
+            
+            strategy_fn = {
+                "random": self.random_strategy,
+                "momentum": self.momentum_strategy,
+                "value": self.value_strategy
+            }.get(self.strategy, self.random_strategy)
+            
+            print(f"🤖 {self.name} démarre avec stratégie: {self.strategy}")
             
-            await asyncio.sleep(interval)
+            while self.running:
+                try:
+                    # État et entreprises sont indépendants: en parallèle
+                    _, companies = await asyncio.gather(
+                        self.get_state(),
+                        self.get_companies()
+                    )
+                    await strategy_fn(companies)
+                    
+                    # Utiliser des services aléatoirement (génère de la revenue)
+                    if random.random() < 0.3:  # 30% chance
+                        if companies:
+                            company = random.choice(companies)
+                            if await self.use_service(company["ticker"]):
+                                print(f"⚡ {self.name} utilise ${company['ticker']}")
+                    
+                except Exception as e:
+                    print(f"❌ {self.name} erreur: {e}")
+                
+                await asyncio.sleep(interval)
+        finally:
+            await self._client.aclose()
+            self._client = None
     
     def stop(self):
         """Arrête le bot"""
@@ -260,5 +287,11 @@ async def run_multiple_bots(num_bots: int = 5):
 
 
 if __name__ == "__main__":
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass  # Boucle asyncio standard
+    
     print("🚀 Lancement des bots traders...")
     asyncio.run(run_multiple_bots(5))
@@ -1,11 +1,20 @@
 """API FastAPI pour AIVERSE"""
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Optional
+from typing import Literal, Optional
 from datetime import datetime
+from contextlib import asynccontextmanager
 import asyncio
-import json
+from collections import defaultdict
+import logging
+from logging.handlers import QueueHandler, QueueListener
+import queue
+import time
+
+import httpx
+import msgspec
+import orjson
 
 import sys
 import os
@@ -18,12 +27,44 @@ from core import (
 from core.bots import BotManager
 
 
-# === PYDANTIC MODELS ===
+# === MSGSPEC MODELS (requêtes fréquentes des bots) ===
 
-class JoinRequest(BaseModel):
+class JoinRequest(msgspec.Struct):
     agent_id: str
     name: str
 
+class OrderRequest(msgspec.Struct):
+    agent_id: str
+    ticker: str
+    side: Literal["buy", "sell"]
+    quantity: float
+    order_type: Literal["limit", "market"] = "limit"
+    price: Optional[float] = None
+
+class UseServiceRequest(msgspec.Struct):
+    agent_id: str
+    ticker: str
+
+def decode_body(body: bytes, struct_type):
+    """Décode et valide un corps JSON (422 si invalide)"""
+    try:
+        return msgspec.json.decode(body, type=struct_type)
+    except (msgspec.ValidationError, msgspec.DecodeError) as e:
+        raise HTTPException(422, str(e))
+
+def json_body_schema(struct_type) -> dict:
+    """Documente un corps msgspec dans l'OpenAPI"""
+    _, components = msgspec.json.schema_components([struct_type])
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": components[struct_type.__name__]}}
+        }
+    }
+
+
+# === PYDANTIC MODELS ===
+
 class CreateCompanyRequest(BaseModel):
     founder_id: str
     ticker: str
@@ -37,18 +78,6 @@ class IPORequest(BaseModel):
     shares: int
     price: float
 
-class OrderRequest(BaseModel):
-    agent_id: str
-    ticker: str
-    side: str  # "buy" or "sell"
-    order_type: str = "limit"  # "market" or "limit"
-    quantity: float
-    price: Optional[float] = None
-
-class UseServiceRequest(BaseModel):
-    agent_id: str
-    ticker: str
-
 class AgentResponse(BaseModel):
     id: str
     name: str
@@ -72,66 +101,208 @@ class CompanyResponse(BaseModel):
 
 # === WORLD INSTANCE ===
 
-world = AIVerse()
-
 # Agent système pour seed
 SYSTEM_AGENT_ID = "system"
-world.join(SYSTEM_AGENT_ID, "AIVERSE System")
-world.exchange.agents[SYSTEM_AGENT_ID].balance = 1_000_000_000  # Infinite money glitch
 
-# Seed initial companies
-seed_initial_companies(world, SYSTEM_AGENT_ID)
+def create_world() -> AIVerse:
+    """Crée le monde et ses entreprises initiales"""
+    world = AIVerse()
+    
+    world.join(SYSTEM_AGENT_ID, "AIVERSE System")
+    world.exchange.agents[SYSTEM_AGENT_ID].balance = 1_000_000_000  # Infinite money glitch
+    world.exchange.mark_dirty(SYSTEM_AGENT_ID)
+    
+    # Seed initial companies
+    seed_initial_companies(world, SYSTEM_AGENT_ID)
+    
+    return world
 
-# Bot manager
-bot_manager = BotManager(world)
-bot_manager.initialize()
+def get_world(request: Request) -> AIVerse:
+    """Dépendance FastAPI: le monde créé dans le lifespan"""
+    return request.app.state.world
 
 
 # === WEBSOCKET CONNECTIONS ===
 
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: list[WebSocket] = []
+        self.active_connections: set[WebSocket] = set()
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.active_connections.add(websocket)
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except:
-                pass
+        self.active_connections.discard(websocket)
+
+    async def _safe_send(self, websocket: WebSocket, payload: str):
+        try:
+            await websocket.send_text(payload)
+        except Exception:
+            self.disconnect(websocket)
+
+    async def broadcast_text(self, payload: str):
+        # Payload déjà sérialisé, envoyé à tous les clients en parallèle
+        await asyncio.gather(
+            *(self._safe_send(c, payload) for c in list(self.active_connections)),
+            return_exceptions=True
+        )
 
 manager = ConnectionManager()
 
+# Les événements sont regroupés puis envoyés en une seule frame
+EVENT_FLUSH_INTERVAL = 0.02  # Attente max avant envoi (s)
+EVENT_MAX_BATCH = 200  # Événements max par frame
+
+event_buffer: list[dict] = []
+
 # Hook events to broadcast
 def on_world_event(event):
-    asyncio.create_task(manager.broadcast({
-        "type": "event",
+    event_buffer.append({
         "event_type": event.event_type,
         "ticker": event.ticker,
         "message": event.message,
-        "timestamp": event.timestamp.isoformat()
-    }))
+        "timestamp": event.timestamp
+    })
+
+async def flush_events_loop():
+    """Envoie les événements en attente par lots"""
+    while True:
+        await asyncio.sleep(EVENT_FLUSH_INTERVAL)
+        if not event_buffer:
+            continue
+        
+        batch = event_buffer[:]
+        event_buffer.clear()
+        if not manager.active_connections:
+            continue
+        
+        for i in range(0, len(batch), EVENT_MAX_BATCH):
+            await manager.broadcast_text(orjson.dumps({
+                "type": "events",
+                "items": batch[i:i + EVENT_MAX_BATCH]
+            }).decode())
+
+
+# === SERVICE USAGE QUEUE ===
+
+USE_FLUSH_INTERVAL = 0.1  # Intervalle de traitement des utilisations (s)
+
+def flush_use_queue(world: AIVerse):
+    """Applique les utilisations de services en attente, groupées par ticker"""
+    if world.use_queue.empty():
+        return
+    
+    by_ticker: dict[str, list[str]] = defaultdict(list)
+    while not world.use_queue.empty():
+        agent_id, ticker = world.use_queue.get_nowait()
+        by_ticker[ticker].append(agent_id)
+    
+    for ticker, agent_ids in by_ticker.items():
+        world.use_service_batch(ticker, agent_ids)
+    invalidate_caches()
+
+async def drain_use_queue(world: AIVerse):
+    """Vide périodiquement la file des utilisations de services"""
+    while True:
+        await asyncio.sleep(USE_FLUSH_INTERVAL)
+        flush_use_queue(world)
+
+
+# === RESPONSE CACHE ===
 
-world.on_event = on_world_event
+# Réponses JSON déjà sérialisées: (instant de création, payload)
+COMPANIES_TTL = 1.0
+LEADERBOARD_TTL = 2.0
+LEADERBOARD_MAX = 100  # Borne du paramètre limit (et donc des entrées en cache)
+MARKET_TTL = 0.2
+
+companies_cache: Optional[tuple[float, bytes]] = None
+leaderboard_cache: dict[int, tuple[float, bytes]] = {}
+
+# Données de marché: ticker -> (instant, trade_count au calcul, données)
+market_cache: dict[str, tuple[float, int, dict]] = {}
+
+def invalidate_caches():
+    """Invalide les réponses en cache après une mutation"""
+    global companies_cache
+    companies_cache = None
+    leaderboard_cache.clear()
 
 
 # === FASTAPI APP ===
 
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse, Response
 from pathlib import Path
 
+log = logging.getLogger(__name__)
+
+
+def setup_logging() -> tuple[QueueHandler, QueueListener]:
+    """Logs asynchrones: les appelants (bots, routes) ne font qu'enfiler,
+    un thread du QueueListener écrit sur stderr"""
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    
+    queue_handler = QueueHandler(log_queue)
+    logging.getLogger().addHandler(queue_handler)
+    for name in ("core", __name__):
+        logging.getLogger(name).setLevel(logging.INFO)
+    
+    listener = QueueListener(log_queue, handler)
+    listener.start()
+    return queue_handler, listener
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialise le monde, démarre les bots et les tâches de fond"""
+    app.state.http = httpx.AsyncClient(timeout=5.0)  # Pour les appels sortants
+    
+    log_handler, log_listener = setup_logging()
+    
+    world = create_world()
+    app.state.world = world
+    
+    # Caches et tampon sont globaux au module: repartir à vide pour ce monde
+    invalidate_caches()
+    market_cache.clear()
+    event_buffer.clear()
+    
+    bot_manager = BotManager(world)
+    bot_manager.initialize()
+    
+    world.on_event = on_world_event
+    tasks = [
+        asyncio.create_task(flush_events_loop()),
+        asyncio.create_task(drain_use_queue(world)),
+    ]
+    bot_manager.start(interval=15.0)  # Trade every 15 seconds
+    log.info("🚀 AIVERSE is LIVE - Bots are trading!")
+    
+    try:
+        yield
+    finally:
+        bot_manager.stop()
+        for task in tasks:
+            task.cancel()
+        # Attendre la fin réelle des tâches (log d'arrêt des bots compris)
+        await asyncio.gather(bot_manager._task, *tasks, return_exceptions=True)
+        # Utilisations déjà acceptées (success renvoyé): les appliquer avant de quitter
+        flush_use_queue(world)
+        
+        await app.state.http.aclose()
+        logging.getLogger().removeHandler(log_handler)
+        log_listener.stop()  # Vide la file avant de quitter
+
 app = FastAPI(
     title="AIVERSE API",
     description="Le monde virtuel économique des IAs",
-    version="0.1.0"
+    version="0.1.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Serve frontend
@@ -147,18 +318,8 @@ app.add_middleware(
 
 # === ROUTES ===
 
-@app.on_event("startup")
-async def startup_event():
-    """Démarre les bots au lancement"""
-    bot_manager.start(interval=15.0)  # Trade every 15 seconds
-    print("🚀 AIVERSE is LIVE - Bots are trading!")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Arrête les bots"""
-    bot_manager.stop()
-
 @app.get("/")
+async def root(world: AIVerse = Depends(get_world)):
     """Serve frontend or API info"""
     frontend_file = FRONTEND_DIR / "index.html"
     if frontend_file.exists():
@@ -169,76 +330,62 @@ async def shutdown_event():
         "status": "online",
         "agents": len(world.exchange.agents),
         "companies": len(world.exchange.companies),
-        "trades": len(world.exchange.trades)
+        "trades": world.exchange.trade_count
     }
 
 @app.get("/api")
-async def api_info():
+async def api_info(world: AIVerse = Depends(get_world)):
     return {
         "name": "AIVERSE",
         "version": "0.1.0",
         "status": "online",
         "agents": len(world.exchange.agents),
         "companies": len(world.exchange.companies),
-        "trades": len(world.exchange.trades)
+        "trades": world.exchange.trade_count
     }
 
 
 @app.get("/state")
-async def get_state():
+async def get_state(world: AIVerse = Depends(get_world)):
     """État global du monde"""
     return world.get_state()
 
 
 @app.get("/news")
-async def get_news(limit: int = 20):
+async def get_news(limit: int = 20, world: AIVerse = Depends(get_world)):
     """Flux d'actualités"""
     events = world.get_news_feed(limit)
-    return [
-        {
-            "type": e.event_type,
-            "ticker": e.ticker,
-            "message": e.message,
-            "timestamp": e.timestamp.isoformat()
-        }
-        for e in events
-    ]
+    # Sérialisé directement par orjson (pas de passage par jsonable_encoder)
+    payload = orjson.dumps([e.to_dict() for e in events])
+    return Response(payload, media_type="application/json")
 
 
 # --- AGENTS ---
 
-@app.post("/agents/join", response_model=AgentResponse)
-async def join_world(request: JoinRequest):
+@app.post(
+    "/agents/join",
+    response_model=None,
+    responses={200: {"model": AgentResponse}},
+    openapi_extra=json_body_schema(JoinRequest)
+)
+async def join_world(req: Request, world: AIVerse = Depends(get_world)):
     """Rejoindre AIVERSE"""
+    request = decode_body(await req.body(), JoinRequest)
     agent = world.join(request.agent_id, request.name)
-    return AgentResponse(
-        id=agent.id,
-        name=agent.name,
-        balance=agent.balance,
-        portfolio=agent.portfolio,
-        reputation=agent.reputation,
-        total_trades=agent.total_trades
-    )
+    return agent.to_response_dict()
 
 
-@app.get("/agents/{agent_id}", response_model=AgentResponse)
-async def get_agent(agent_id: str):
+@app.get("/agents/{agent_id}", response_model=None, responses={200: {"model": AgentResponse}})
+async def get_agent(agent_id: str, world: AIVerse = Depends(get_world)):
     """Infos sur un agent"""
     agent = world.exchange.get_agent(agent_id)
     if not agent:
         raise HTTPException(404, "Agent non trouvé")
-    return AgentResponse(
-        id=agent.id,
-        name=agent.name,
-        balance=agent.balance,
-        portfolio=agent.portfolio,
-        reputation=agent.reputation,
-        total_trades=agent.total_trades
-    )
+    return agent.to_response_dict()
 
 
 @app.get("/agents")
-async def list_agents():
+async def list_agents(world: AIVerse = Depends(get_world)):
     """Liste tous les agents"""
     return [
         {
@@ -253,10 +400,18 @@ async def list_agents():
 
 
 @app.get("/leaderboard")
-async def get_leaderboard(limit: int = 10):
+async def get_leaderboard(
+    limit: int = Query(10, ge=0, le=LEADERBOARD_MAX),
+    world: AIVerse = Depends(get_world)
+):
     """Classement des agents"""
+    now = time.monotonic()
+    cached = leaderboard_cache.get(limit)
+    if cached and now - cached[0] < LEADERBOARD_TTL:
+        return Response(cached[1], media_type="application/json")
+    
     rankings = world.exchange.get_leaderboard(limit)
-    return [
+    payload = orjson.dumps([
         {
             "rank": i + 1,
             "name": agent.name,
@@ -266,13 +421,15 @@ async def get_leaderboard(limit: int = 10):
         }
         for i, (agent, net_worth) in enumerate(rankings)
         if agent.id != SYSTEM_AGENT_ID
-    ]
+    ])
+    leaderboard_cache[limit] = (now, payload)
+    return Response(payload, media_type="application/json")
 
 
 # --- COMPANIES ---
 
-@app.post("/companies/create", response_model=CompanyResponse)
-async def create_company(request: CreateCompanyRequest):
+@app.post("/companies/create", response_model=None, responses={200: {"model": CompanyResponse}})
+async def create_company(request: CreateCompanyRequest, world: AIVerse = Depends(get_world)):
     """Créer une entreprise"""
     company, msg = world.create_company(
         founder_id=request.founder_id,
@@ -286,87 +443,70 @@ async def create_company(request: CreateCompanyRequest):
     if not company:
         raise HTTPException(400, msg)
     
-    return CompanyResponse(
-        ticker=company.ticker,
-        name=company.name,
-        description=company.description,
-        status=company.status.value,
-        share_price=company.share_price,
-        market_cap=company.market_cap,
-        service_type=company.service_type,
-        service_cost=company.service_cost,
-        daily_active_users=company.daily_active_users,
-        total_api_calls=company.total_api_calls
-    )
+    invalidate_caches()
+    return company.to_response_dict()
 
 
 @app.post("/companies/{ticker}/ipo")
-async def launch_ipo(ticker: str, request: IPORequest):
+async def launch_ipo(ticker: str, request: IPORequest, world: AIVerse = Depends(get_world)):
     """Lancer une IPO"""
     success, msg = world.launch_ipo(ticker, request.shares, request.price)
     if not success:
         raise HTTPException(400, msg)
+    invalidate_caches()
     return {"success": True, "message": msg}
 
 
-@app.get("/companies", response_model=list[CompanyResponse])
-async def list_companies():
+@app.get("/companies", response_model=None, responses={200: {"model": list[CompanyResponse]}})
+async def list_companies(world: AIVerse = Depends(get_world)):
     """Liste toutes les entreprises"""
-    return [
-        CompanyResponse(
-            ticker=c.ticker,
-            name=c.name,
-            description=c.description,
-            status=c.status.value,
-            share_price=c.share_price,
-            market_cap=c.market_cap,
-            service_type=c.service_type,
-            service_cost=c.service_cost,
-            daily_active_users=c.daily_active_users,
-            total_api_calls=c.total_api_calls
-        )
-        for c in world.exchange.companies.values()
-    ]
+    global companies_cache
+    now = time.monotonic()
+    if companies_cache and now - companies_cache[0] < COMPANIES_TTL:
+        return Response(companies_cache[1], media_type="application/json")
+    
+    payload = orjson.dumps([
+        c.to_response_dict() for c in world.exchange.companies.values()
+    ])
+    companies_cache = (now, payload)
+    return Response(payload, media_type="application/json")
 
 
-@app.get("/companies/{ticker}", response_model=CompanyResponse)
-async def get_company(ticker: str):
+@app.get("/companies/{ticker}", response_model=None, responses={200: {"model": CompanyResponse}})
+async def get_company(ticker: str, world: AIVerse = Depends(get_world)):
     """Infos sur une entreprise"""
     company = world.exchange.companies.get(ticker.upper())
     if not company:
         raise HTTPException(404, "Entreprise non trouvée")
     
-    return CompanyResponse(
-        ticker=company.ticker,
-        name=company.name,
-        description=company.description,
-        status=company.status.value,
-        share_price=company.share_price,
-        market_cap=company.market_cap,
-        service_type=company.service_type,
-        service_cost=company.service_cost,
-        daily_active_users=company.daily_active_users,
-        total_api_calls=company.total_api_calls
-    )
+    return company.to_response_dict()
 
 
-@app.post("/companies/{ticker}/use")
-async def use_service(ticker: str, request: UseServiceRequest):
+@app.post("/companies/{ticker}/use", openapi_extra=json_body_schema(UseServiceRequest))
+async def use_service(ticker: str, req: Request, world: AIVerse = Depends(get_world)):
     """Utiliser le service d'une entreprise"""
-    success, msg = world.use_service(request.agent_id, ticker)
-    if not success:
-        raise HTTPException(400, msg)
-    return {"success": True, "message": msg}
+    request = decode_body(await req.body(), UseServiceRequest)
+    ticker = ticker.upper()
+    
+    # Validation immédiate (solde compris), la transaction est appliquée par
+    # drain_use_queue qui revérifie le solde au moment du débit
+    company, error = world.check_service_use(request.agent_id, ticker)
+    if not company:
+        raise HTTPException(400, error)
+    
+    world.use_queue.put_nowait((request.agent_id, ticker))
+    return {"success": True, "message": f"Service en file d'attente: -{company.service_cost}₳"}
 
 
 # --- TRADING ---
 
-@app.post("/orders")
-async def submit_order(request: OrderRequest):
+@app.post("/orders", openapi_extra=json_body_schema(OrderRequest))
+async def submit_order(req: Request, world: AIVerse = Depends(get_world)):
     """Soumettre un ordre"""
+    request = decode_body(await req.body(), OrderRequest)
     order = Order(
         agent_id=request.agent_id,
-        ticker=request.ticker.upper(),
+        ticker=request.ticker,  # Normalisé par Order
         side=OrderSide(request.side),
         order_type=OrderType(request.order_type),
         quantity=request.quantity,
@@ -374,10 +514,14 @@ async def submit_order(request: OrderRequest):
     )
     
     result = world.exchange.submit_order(order)
+    market_cache.pop(order.ticker, None)  # Carnet modifié
     
     if not result:
         raise HTTPException(400, "Ordre rejeté (solde/holdings insuffisants)")
     
+    if result.filled_quantity > 0:
+        invalidate_caches()
+    
     return {
         "order_id": result.id,
         "status": result.status.value,
@@ -386,13 +530,7 @@ async def submit_order(request: OrderRequest):
     }
 
 
-@app.get("/market/{ticker}")
-async def get_market_data(ticker: str):
-    """Données de marché pour un ticker"""
-    data = world.exchange.get_market_data(ticker.upper())
-    if not data:
-        raise HTTPException(404, "Ticker non trouvé")
-    
+def market_data_to_dict(data: MarketData) -> dict:
     return {
         "ticker": data.ticker,
         "last_price": data.last_price,
@@ -406,14 +544,47 @@ async def get_market_data(ticker: str):
     }
 
 
-@app.get("/trades")
-async def get_recent_trades(ticker: Optional[str] = None, limit: int = 50):
-    """Historique des trades"""
-    trades = world.exchange.trades[-limit:]
+def cached_market_data(world: AIVerse, ticker: str) -> Optional[dict]:
+    """Données de marché, recalculées au plus toutes les MARKET_TTL s ou après un trade"""
+    now = time.monotonic()
+    cached = market_cache.get(ticker)
+    if cached and now - cached[0] < MARKET_TTL and cached[1] == world.exchange.trade_count:
+        return cached[2]
+    
+    data = world.exchange.get_market_data(ticker)
+    if not data:
+        return None
     
-    if ticker:
-        trades = [t for t in trades if t.ticker == ticker.upper()]
+    result = market_data_to_dict(data)
+    market_cache[ticker] = (now, world.exchange.trade_count, result)
+    return result
+
+
+@app.get("/market")
+async def get_market_data_batch(tickers: str, world: AIVerse = Depends(get_world)):
+    """Données de marché pour plusieurs tickers (ex: ?tickers=CTX,FACT)"""
+    result = {}
+    for ticker in tickers.split(","):
+        ticker = ticker.strip().upper()
+        data = cached_market_data(world, ticker)
+        if data:
+            result[ticker] = data
+    return result
+
+
+@app.get("/market/{ticker}")
+async def get_market_data(ticker: str, world: AIVerse = Depends(get_world)):
+    """Données de marché pour un ticker"""
+    data = cached_market_data(world, ticker.upper())
+    if not data:
+        raise HTTPException(404, "Ticker non trouvé")
     
+    return data
+
+
+@app.get("/trades")
+async def get_recent_trades(ticker: Optional[str] = None, limit: int = 50, world: AIVerse = Depends(get_world)):
+    """Historique des trades"""
     return [
         {
             "id": t.id,
@@ -422,9 +593,9 @@ async def get_recent_trades(ticker: Optional[str] = None, limit: int = 50):
             "seller": t.seller_id,
             "quantity": t.quantity,
             "price": t.price,
-            "timestamp": t.timestamp.isoformat()
+            "timestamp": t.timestamp_datetime
         }
-        for t in reversed(trades)
+        for t in world.exchange.recent_trades(ticker, limit)
     ]
 
 
@@ -449,4 +620,6 @@ async def websocket_endpoint(websocket: WebSocket):
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 8080))
+    # loop/http "auto" (défaut): uvloop + httptools quand uvicorn[standard]
+    # les installe, asyncio + h11 sinon (Windows)
     uvicorn.run(app, host="0.0.0.0", port=port)
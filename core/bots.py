@@ -1,12 +1,18 @@
 """Bots traders autonomes qui tournent H24"""
 import asyncio
+import logging
 import random
+from dataclasses import dataclass
 from datetime import datetime
 from typing import TYPE_CHECKING
 
+from .types import Company, Order, OrderSide, OrderType
+
 if TYPE_CHECKING:
     from .world import AIVerse
 
+log = logging.getLogger(__name__)
+
 BOT_PROFILES = [
     {"id": "bot_alpha", "name": "AlphaTrader 🤖", "strategy": "momentum", "aggression": 0.8},
     {"id": "bot_beta", "name": "BetaBot 🧠", "strategy": "value", "aggression": 0.5},
@@ -18,140 +24,149 @@ BOT_PROFILES = [
 ]
 
 
+@dataclass
+class TickSignals:
+    """Signaux de marché calculés une seule fois par tick pour tous les bots"""
+    moved: list[tuple[Company, float]]  # (company, variation relative) des prix qui ont bougé
+    value_picks: list[tuple[Company, float]]  # (company, value score) hors zone neutre
+
+
 class AutoTrader:
     """Bot trader autonome"""
     
     def __init__(self, world: 'AIVerse', profile: dict):
         self.world = world
+        self.exchange = world.exchange  # Raccourci (évite self.world.exchange partout)
         self.id = profile["id"]
         self.name = profile["name"]
         self.strategy = profile["strategy"]
         self.aggression = profile["aggression"]  # 0-1, how often it trades
-        self.last_prices = {}
+        
+        # Générateur propre au bot, seedé par son id: tirages reproductibles
+        # et indépendants du random global
+        self.rng = random.Random(self.id)
+        
+        # Stratégie résolue une fois pour toutes (pas de comparaison de chaînes par tick)
+        self._trade_fn = {
+            "momentum": self._momentum_trade,
+            "value": self._value_trade,
+            "contrarian": self._contrarian_trade,
+        }.get(self.strategy, self._random_trade)
         
     def join(self):
         """Rejoindre le monde"""
         return self.world.join(self.id, self.name)
     
     def get_agent(self):
-        return self.world.exchange.get_agent(self.id)
+        return self.exchange.get_agent(self.id)
     
-    def tick(self):
-        """Exécute un tick de trading"""
+    async def tick(self, signals: TickSignals):
+        """Exécute un tick de trading (signals: calculés par le BotManager)"""
         # Random chance based on aggression
-        if random.random() > self.aggression:
+        if self.rng.random() > self.aggression:
             return
         
         agent = self.get_agent()
         if not agent:
             return
             
-        companies = list(self.world.exchange.companies.values())
+        companies = self.exchange.companies_snapshot
         if not companies:
             return
         
-        # Pick strategy
-        if self.strategy == "momentum":
-            self._momentum_trade(agent, companies)
-        elif self.strategy == "value":
-            self._value_trade(agent, companies)
-        elif self.strategy == "contrarian":
-            self._contrarian_trade(agent, companies)
-        else:
-            self._random_trade(agent, companies)
+        # Les stratégies collectent leurs ordres, soumis en un seul lot
+        orders = []
+        self._trade_fn(agent, companies, signals, orders)
+        if orders:
+            self._submit_orders(orders)
         
         # Sometimes use services (generates revenue)
-        if random.random() < 0.3:
-            company = random.choice(companies)
+        if self.rng.random() < 0.3:
+            company = self.rng.choice(companies)
             self.world.use_service(self.id, company.ticker)
     
-    def _momentum_trade(self, agent, companies):
+    def _momentum_trade(self, agent, companies, signals, orders):
         """Buy assets that are going up, sell those going down"""
-        for company in companies:
+        # Unmoved companies have a zero change: only the moved ones matter
+        for company, change in signals.moved:
             ticker = company.ticker
             current_price = company.share_price
-            last_price = self.last_prices.get(ticker, current_price)
-            
-            change = (current_price - last_price) / last_price if last_price > 0 else 0
-            self.last_prices[ticker] = current_price
             
             if change > 0.02 and agent.balance > current_price * 5:
                 # Going up - buy
-                qty = random.randint(1, 5)
-                self._submit_order(ticker, "buy", qty, current_price * 1.01)
+                qty = self.rng.randint(1, 5)
+                self._add_order(orders, ticker, "buy", qty, current_price * 1.01)
             elif change < -0.02 and agent.portfolio.get(ticker, 0) > 0:
                 # Going down - sell
-                qty = min(random.randint(1, 3), agent.portfolio.get(ticker, 0))
-                self._submit_order(ticker, "sell", qty, current_price * 0.99)
+                qty = min(self.rng.randint(1, 3), agent.portfolio.get(ticker, 0))
+                self._add_order(orders, ticker, "sell", qty, current_price * 0.99)
     
-    def _value_trade(self, agent, companies):
+    def _value_trade(self, agent, companies, signals, orders):
         """Buy undervalued assets (high usage, low price)"""
-        for company in companies:
+        # Only companies outside the neutral zone (scored once per tick)
+        for company, value_score in signals.value_picks:
             ticker = company.ticker
             price = company.share_price
-            usage = company.total_api_calls + 1
-            
-            # Value score: lower is better (cheap relative to usage)
-            value_score = price / usage
             
             if value_score < 1.0 and agent.balance > price * 10:
-                qty = random.randint(5, 15)
-                self._submit_order(ticker, "buy", qty, price * 1.02)
+                qty = self.rng.randint(5, 15)
+                self._add_order(orders, ticker, "buy", qty, price * 1.02)
             elif value_score > 5.0 and agent.portfolio.get(ticker, 0) > 0:
-                qty = min(random.randint(1, 5), agent.portfolio.get(ticker, 0))
-                self._submit_order(ticker, "sell", qty, price * 0.98)
+                qty = min(self.rng.randint(1, 5), agent.portfolio.get(ticker, 0))
+                self._add_order(orders, ticker, "sell", qty, price * 0.98)
     
-    def _contrarian_trade(self, agent, companies):
+    def _contrarian_trade(self, agent, companies, signals, orders):
         """Do the opposite of momentum"""
-        for company in companies:
+        for company, change in signals.moved:
             ticker = company.ticker
             current_price = company.share_price
-            last_price = self.last_prices.get(ticker, current_price)
-            
-            change = (current_price - last_price) / last_price if last_price > 0 else 0
-            self.last_prices[ticker] = current_price
             
             # Buy when going down (contrarian)
             if change < -0.02 and agent.balance > current_price * 5:
-                qty = random.randint(2, 8)
-                self._submit_order(ticker, "buy", qty, current_price * 1.01)
+                qty = self.rng.randint(2, 8)
+                self._add_order(orders, ticker, "buy", qty, current_price * 1.01)
             # Sell when going up
             elif change > 0.02 and agent.portfolio.get(ticker, 0) > 0:
-                qty = min(random.randint(1, 4), agent.portfolio.get(ticker, 0))
-                self._submit_order(ticker, "sell", qty, current_price * 0.99)
+                qty = min(self.rng.randint(1, 4), agent.portfolio.get(ticker, 0))
+                self._add_order(orders, ticker, "sell", qty, current_price * 0.99)
     
-    def _random_trade(self, agent, companies):
+    def _random_trade(self, agent, companies, signals, orders):
         """Random trading (baseline)"""
-        company = random.choice(companies)
+        company = self.rng.choice(companies)
         ticker = company.ticker
         price = company.share_price
         
-        action = random.choice(["buy", "sell", "hold", "hold"])
+        action = self.rng.choice(["buy", "sell", "hold", "hold"])
         
         if action == "buy" and agent.balance > price * 5:
-            qty = random.randint(1, 10)
-            self._submit_order(ticker, "buy", qty, price * random.uniform(0.98, 1.02))
+            qty = self.rng.randint(1, 10)
+            self._add_order(orders, ticker, "buy", qty, price * self.rng.uniform(0.98, 1.02))
         elif action == "sell" and agent.portfolio.get(ticker, 0) > 0:
-            qty = min(random.randint(1, 5), agent.portfolio.get(ticker, 0))
-            self._submit_order(ticker, "sell", qty, price * random.uniform(0.98, 1.02))
+            qty = min(self.rng.randint(1, 5), agent.portfolio.get(ticker, 0))
+            self._add_order(orders, ticker, "sell", qty, price * self.rng.uniform(0.98, 1.02))
     
-    def _submit_order(self, ticker: str, side: str, qty: int, price: float):
-        """Submit an order"""
-        from .types import Order, OrderSide, OrderType
-        
-        order = Order(
+    def _add_order(self, orders: list, ticker: str, side: str, qty: int, price: float):
+        """Prepare an order for this tick's batch"""
+        orders.append(Order(
             agent_id=self.id,
             ticker=ticker,
             side=OrderSide(side),
             order_type=OrderType.LIMIT,
             quantity=qty,
             price=round(price, 2)
-        )
+        ))
+    
+    def _submit_orders(self, orders: list):
+        """Submit this tick's orders in one batch"""
+        # Pas de verrou: le matching est synchrone et s'exécute d'un bloc
+        # sur le thread de la boucle, sans await entre lecture et écriture
+        results = self.exchange.submit_orders(orders)
         
-        result = self.world.exchange.submit_order(order)
-        if result and result.filled_quantity > 0:
-            emoji = "📈" if side == "buy" else "📉"
-            print(f"{emoji} {self.name} {side.upper()} {qty}x ${ticker} @ {price:.2f}₳")
+        for result in results:
+            if result and result.filled_quantity > 0:
+                side = result.side.value
+                emoji = "📈" if side == "buy" else "📉"
+                log.info("%s %s %s %sx $%s @ %.2f₳", emoji, self.name, side.upper(), result.quantity, result.ticker, result.price)
 
 
 class BotManager:
@@ -162,6 +177,7 @@ class BotManager:
         self.bots: list[AutoTrader] = []
         self.running = False
         self._task = None
+        self._last_prices: dict[str, float] = {}  # Prix au tick précédent
     
     def initialize(self):
         """Crée et enregistre tous les bots"""
@@ -169,27 +185,65 @@ class BotManager:
             bot = AutoTrader(self.world, profile)
             bot.join()
             self.bots.append(bot)
-            print(f"🤖 {bot.name} joined AIVERSE")
+            log.info("🤖 %s joined AIVERSE", bot.name)
+    
+    def _signals(self) -> TickSignals:
+        """Variations de prix et value scores, en une passe pour tous les bots"""
+        moved = []
+        value_picks = []
+        last_prices = self._last_prices
+        changed = self.world.exchange.pop_changed_tickers()
+        for ticker, company in self.world.exchange.companies.items():
+            current_price = company.share_price
+            
+            # Prix inchangé depuis le tick précédent: variation nulle
+            if ticker in changed or ticker not in last_prices:
+                last_price = last_prices.get(ticker, current_price)
+                last_prices[ticker] = current_price
+                if last_price > 0 and current_price != last_price:
+                    moved.append((company, (current_price - last_price) / last_price))
+            
+            # Value score: lower is better (cheap relative to usage)
+            value_score = current_price / (company.total_api_calls + 1)
+            if value_score < 1.0 or value_score > 5.0:
+                value_picks.append((company, value_score))
+        
+        return TickSignals(moved=moved, value_picks=value_picks)
+    
+    async def tick(self):
+        """Un tick de trading pour tous les bots (en concurrence)"""
+        signals = self._signals()
+        await asyncio.gather(*(bot.tick(signals) for bot in self.bots))
     
     async def run(self, interval: float = 10.0):
-        """Boucle principale des bots"""
+        """Boucle principale des bots (cadence fixe, sans dérive)"""
         self.running = True
-        print(f"🚀 Bot manager started - {len(self.bots)} bots trading every {interval}s")
+        log.info("🚀 Bot manager started - %d bots trading every %ss", len(self.bots), interval)
         
-        while self.running:
-            try:
-                for bot in self.bots:
-                    bot.tick()
-                
-                # Distribute daily income occasionally (simulated)
-                if random.random() < 0.01:  # ~1% chance per tick
-                    self.world.exchange.daily_income()
-                    print("💰 Daily income distributed to all agents")
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        
+        try:
+            while self.running:
+                try:
+                    await self.tick()
                     
-            except Exception as e:
-                print(f"❌ Bot error: {e}")
-            
-            await asyncio.sleep(interval)
+                    # Distribute daily income occasionally (simulated)
+                    if random.random() < 0.01:  # ~1% chance per tick
+                        self.world.exchange.daily_income()
+                        log.info("💰 Daily income distributed to all agents")
+                        
+                except Exception as e:
+                    log.error("❌ Bot error: %s", e)
+                
+                # La durée du tick est déduite de l'attente; en retard, on
+                # repart de maintenant plutôt que d'enchaîner des ticks
+                deadline = max(deadline + interval, loop.time())
+                await asyncio.sleep(deadline - loop.time())
+        except asyncio.CancelledError:
+            self.running = False
+            log.info("🛑 Bot manager stopped")
+            raise
     
     def start(self, interval: float = 10.0):
         """Démarre les bots en background"""
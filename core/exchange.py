@@ -1,53 +1,69 @@
 """AIEX - L'exchange d'AIVERSE"""
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
 from typing import Optional
-from collections import defaultdict
-import heapq
+from collections import defaultdict, deque
+import time
+from itertools import islice
+
+from sortedcontainers import SortedDict, SortedList
 
 from .types import (
     Agent, Company, Order, Trade, MarketData,
     OrderSide, OrderType, OrderStatus, CompanyStatus
 )
 
+DAY_SECONDS = 24 * 3600  # Fenêtre des stats 24h
+TRADES_BUFFER = 100_000  # Trades conservés (tous tickers)
+TICKER_TRADES_BUFFER = 10_000  # Trades conservés par ticker
+PRICE_HISTORY_LEN = 10_000  # Points d'historique de prix par ticker
+
 
 @dataclass
 class OrderBook:
     """Carnet d'ordres pour un ticker"""
     ticker: str
-    # Heaps: (price, timestamp, order) - min heap pour asks, max heap (neg price) pour bids
-    bids: list = field(default_factory=list)  # Ordres d'achat
-    asks: list = field(default_factory=list)  # Ordres de vente
+    # Niveaux de prix: price -> deque d'ordres (priorité temps dans chaque niveau)
+    bids: SortedDict = field(default_factory=SortedDict)  # Ordres d'achat
+    asks: SortedDict = field(default_factory=SortedDict)  # Ordres de vente
     
     def add_order(self, order: Order):
         """Ajoute un ordre au carnet"""
-        entry = (
-            -order.price if order.side == OrderSide.BUY else order.price,
-            order.created_at.timestamp(),
-            order
-        )
-        if order.side == OrderSide.BUY:
-            heapq.heappush(self.bids, entry)
-        else:
-            heapq.heappush(self.asks, entry)
+        levels = self.bids if order.is_buy else self.asks
+        level = levels.get(order.price)
+        if level is None:
+            level = levels[order.price] = deque()
+        level.append(order)
+    
+    def remove_order(self, order: Order) -> bool:
+        """Retire un ordre du carnet (annulation)"""
+        levels = self.bids if order.is_buy else self.asks
+        level = levels.get(order.price)
+        if not level or order not in level:
+            return False
+        
+        level.remove(order)
+        if not level:
+            del levels[order.price]
+        return True
+    
+    def _best(self, levels: SortedDict, index: int) -> Optional[Order]:
+        """Premier ordre du meilleur niveau
+        
+        Le carnet ne contient que des ordres actifs (les ordres exécutés
+        sont retirés au fil du matching, les annulés par remove_order) et
+        aucun niveau vide: pas de purge, O(1) quand le côté est vide.
+        """
+        if not levels:
+            return None
+        return levels.peekitem(index)[1][0]
     
     def best_bid(self) -> Optional[Order]:
         """Meilleur prix d'achat"""
-        while self.bids:
-            _, _, order = self.bids[0]
-            if order.status == OrderStatus.PENDING:
-                return order
-            heapq.heappop(self.bids)
-        return None
+        return self._best(self.bids, -1)
     
     def best_ask(self) -> Optional[Order]:
         """Meilleur prix de vente"""
-        while self.asks:
-            _, _, order = self.asks[0]
-            if order.status == OrderStatus.PENDING:
-                return order
-            heapq.heappop(self.asks)
-        return None
+        return self._best(self.asks, 0)
     
     def spread(self) -> Optional[tuple[float, float]]:
         """Retourne (bid, ask) ou None"""
@@ -58,18 +74,81 @@ class OrderBook:
         return None
 
 
+@dataclass
+class TradeWindow:
+    """Fenêtre glissante 24h des trades d'un ticker
+    
+    Volume cumulé et min/max (deques monotones) tenus à jour à chaque
+    trade: lecture en O(1), O(1) amorti par trade.
+    """
+    trades: deque = field(default_factory=deque)  # (ts, price, notional)
+    volume: float = 0.0
+    highs: deque = field(default_factory=deque)  # (ts, price), prix décroissants
+    lows: deque = field(default_factory=deque)  # (ts, price), prix croissants
+    
+    def add(self, ts: float, price: float, quantity: float):
+        """Ajoute un trade (horodatages croissants)"""
+        notional = quantity * price
+        self.trades.append((ts, price, notional))
+        self.volume += notional
+        
+        while self.highs and self.highs[-1][1] <= price:
+            self.highs.pop()
+        self.highs.append((ts, price))
+        while self.lows and self.lows[-1][1] >= price:
+            self.lows.pop()
+        self.lows.append((ts, price))
+    
+    def evict(self, cutoff: float):
+        """Retire les trades antérieurs ou égaux à cutoff"""
+        trades = self.trades
+        while trades and trades[0][0] <= cutoff:
+            self.volume -= trades.popleft()[2]
+        if not trades:
+            self.volume = 0.0  # Pas de dérive d'arrondi quand la fenêtre se vide
+        
+        while self.highs and self.highs[0][0] <= cutoff:
+            self.highs.popleft()
+        while self.lows and self.lows[0][0] <= cutoff:
+            self.lows.popleft()
+
+
 class Exchange:
     """Moteur d'exchange AIEX"""
     
     def __init__(self):
         self.agents: dict[str, Agent] = {}
         self.companies: dict[str, Company] = {}  # ticker -> Company
+        self.companies_snapshot: tuple[Company, ...] = ()  # Reconstruit à chaque création
+        self.active_tickers: frozenset[str] = frozenset()  # Tickers hors faillite
         self.order_books: dict[str, OrderBook] = {}
-        self.trades: list[Trade] = []
+        # Historique borné des trades (+ index par ticker)
+        self.trades: deque[Trade] = deque(maxlen=TRADES_BUFFER)
+        self.trades_by_ticker: dict[str, deque[Trade]] = defaultdict(lambda: deque(maxlen=TICKER_TRADES_BUFFER))
+        self._windows: dict[str, TradeWindow] = defaultdict(TradeWindow)  # Stats 24h glissantes
+        self.trade_count: int = 0  # Total depuis le lancement
         self.orders: dict[str, Order] = {}  # order_id -> Order
         
-        # Historique des prix pour chaque ticker
-        self.price_history: dict[str, list[tuple[datetime, float]]] = defaultdict(list)
+        # Dernier prix par ticker, tenu à jour à chaque changement de prix
+        # (évite de reconstruire le dict à chaque calcul de net worth)
+        self._price_cache: dict[str, float] = {}
+        self.market_caps: dict[str, float] = {}  # ticker -> market cap, tenu à jour avec le prix
+        self._changed_tickers: set[str] = set()  # Prix modifiés depuis pop_changed_tickers()
+        
+        # Historique borné des prix pour chaque ticker: (ts, prix)
+        self.price_history: dict[str, deque[tuple[float, float]]] = defaultdict(lambda: deque(maxlen=PRICE_HISTORY_LEN))
+        
+        # Détenteurs de chaque ticker: ticker -> {agent_id}
+        self.holders: dict[str, set[str]] = defaultdict(set)
+        
+        # Classement incrémental: (-net_worth, agent_id), seuls les agents
+        # modifiés depuis la dernière lecture sont recalculés
+        self._leaderboard: SortedList = SortedList()
+        self._net_worths: dict[str, float] = {}
+        self._dirty_agents: set[str] = set()
+        # Plus grand top demandé (limit, top), valide tant que rien n'est dirty;
+        # les limites inférieures en sont des tranches
+        self._top_cache: Optional[tuple[int, list[tuple[Agent, float]]]] = None
     
     # === AGENTS ===
     
@@ -80,16 +159,40 @@ class Exchange:
         
         agent = Agent(id=agent_id, name=name, balance=initial_balance)
         self.agents[agent_id] = agent
+        self.mark_dirty(agent_id)
         return agent
     
     def get_agent(self, agent_id: str) -> Optional[Agent]:
         return self.agents.get(agent_id)
     
+    def mark_dirty(self, *agent_ids: str):
+        """Signale un changement de net worth (solde ou positions)"""
+        self._dirty_agents.update(agent_ids)
+    
+    def mark_ticker_dirty(self, ticker: str):
+        """Le prix d'un ticker a changé: ses détenteurs sont à recalculer"""
+        self._dirty_agents.update(self.holders.get(ticker, ()))
+    
+    def set_price(self, ticker: str, price: float):
+        """Met à jour le prix d'un ticker (company, cache de prix, classement)"""
+        company = self.companies[ticker]
+        company.share_price = price
+        company.market_cap = self.market_caps[ticker] = company.total_shares * price
+        self._price_cache[ticker] = price
+        self._changed_tickers.add(ticker)
+        self.mark_ticker_dirty(ticker)
+    
+    def pop_changed_tickers(self) -> set[str]:
+        """Tickers dont le prix a changé depuis l'appel précédent (et remise à zéro)"""
+        changed, self._changed_tickers = self._changed_tickers, set()
+        return changed
+    
     def daily_income(self):
         """Distribue le revenu quotidien à tous les agents"""
         DAILY_INCOME = 1000.0
         for agent in self.agents.values():
             agent.balance += DAILY_INCOME
+        self._dirty_agents.update(self.agents)
     
     # === COMPANIES ===
     
@@ -109,6 +212,7 @@ class Exchange:
         if not founder or founder.balance < CREATION_COST:
             return None
         
+        ticker = ticker.upper()
         if ticker in self.companies:
             return None  # Ticker déjà pris
         
@@ -116,7 +220,7 @@ class Exchange:
         
         company = Company(
             id=ticker.lower(),
-            ticker=ticker.upper(),
+            ticker=ticker,
             name=name,
             description=description,
             founder_id=founder_id,
@@ -124,17 +228,24 @@ class Exchange:
             service_cost=service_cost
         )
         
-        self.companies[ticker.upper()] = company
-        self.order_books[ticker.upper()] = OrderBook(ticker=ticker.upper())
+        self.companies[ticker] = company
+        self.companies_snapshot = tuple(self.companies.values())
+        self.rebuild_active_tickers()
+        self._price_cache[ticker] = company.share_price
+        self.market_caps[ticker] = company.market_cap
+        self.order_books[ticker] = OrderBook(ticker=ticker)
         
         # Le fondateur reçoit toutes les actions initialement
-        founder.portfolio[ticker.upper()] = company.total_shares
+        founder.portfolio[ticker] = company.total_shares
+        self.holders[ticker].add(founder_id)
+        self.mark_dirty(founder_id)
         
         return company
     
     def ipo(self, ticker: str, shares_to_sell: int, price: float) -> bool:
         """Lance une IPO pour une entreprise"""
-        company = self.companies.get(ticker.upper())
+        ticker = ticker.upper()
+        company = self.companies.get(ticker)
         if not company or company.status != CompanyStatus.PRIVATE:
             return False
         
@@ -142,19 +253,18 @@ class Exchange:
         if not founder:
             return False
         
-        founder_shares = founder.portfolio.get(ticker.upper(), 0)
+        founder_shares = founder.portfolio.get(ticker, 0)
         if founder_shares < shares_to_sell:
             return False
         
         company.status = CompanyStatus.IPO
-        company.share_price = price
         company.public_shares = shares_to_sell
-        company.market_cap = company.total_shares * price
+        self.set_price(company.ticker, price)
         
         # Créer un ordre de vente pour l'IPO
         ipo_order = Order(
             agent_id=founder.id,
-            ticker=ticker.upper(),
+            ticker=ticker,
             side=OrderSide.SELL,
             order_type=OrderType.LIMIT,
             quantity=shares_to_sell,
@@ -166,6 +276,13 @@ class Exchange:
         
         return True
     
+    def rebuild_active_tickers(self):
+        """Recalcule les tickers actifs (après création ou faillite)"""
+        self.active_tickers = frozenset(
+            ticker for ticker, company in self.companies.items()
+            if company.status != CompanyStatus.BANKRUPT
+        )
+    
     # === TRADING ===
     
     def submit_order(self, order: Order) -> Optional[Order]:
@@ -174,12 +291,40 @@ class Exchange:
         if not agent:
             return None
         
-        ticker = order.ticker.upper()
+        ticker = order.ticker  # Déjà normalisé par Order
         if ticker not in self.companies:
             return None
         
+        return self._submit(order, agent, ticker)
+    
+    def submit_orders(self, orders: list[Order]) -> list[Optional[Order]]:
+        """Soumet un lot d'ordres (mêmes règles que submit_order)
+        
+        Les agents sont résolus une seule fois et les ordres traités ticker
+        par ticker. Résultats dans l'ordre des ordres reçus.
+        """
+        agents = {agent_id: self.agents.get(agent_id) for agent_id in {o.agent_id for o in orders}}
+        
+        by_ticker: dict[str, list[int]] = defaultdict(list)
+        for i, order in enumerate(orders):
+            by_ticker[order.ticker].append(i)
+        
+        results: list[Optional[Order]] = [None] * len(orders)
+        for ticker, indices in by_ticker.items():
+            if ticker not in self.companies:
+                continue
+            for i in indices:
+                order = orders[i]
+                agent = agents[order.agent_id]
+                if agent:
+                    results[i] = self._submit(order, agent, ticker)
+        
+        return results
+    
+    def _submit(self, order: Order, agent: Agent, ticker: str) -> Optional[Order]:
+        """Vérifie puis exécute un ordre (agent et ticker déjà résolus)"""
         # Vérifications
-        if order.side == OrderSide.BUY:
+        if order.is_buy:
             # Vérifier le solde
             cost = order.quantity * (order.price or self._get_market_price(ticker, OrderSide.BUY))
             if agent.balance < cost:
@@ -203,6 +348,18 @@ class Exchange:
         
         return order
     
+    def cancel_order(self, order_id: str) -> bool:
+        """Annule un ordre en attente et le retire du carnet"""
+        order = self.orders.get(order_id)
+        if not order or order.status != OrderStatus.PENDING:
+            return False
+        
+        book = self.order_books.get(order.ticker)
+        if book:
+            book.remove_order(order)
+        order.status = OrderStatus.CANCELLED
+        return True
+    
     def _get_market_price(self, ticker: str, side: OrderSide) -> float:
         """Obtient le prix du marché pour un ordre market"""
         book = self.order_books.get(ticker)
@@ -217,29 +374,43 @@ class Exchange:
             return bid.price if bid else self.companies[ticker].share_price
     
     def _match_order(self, order: Order):
-        """Tente de matcher un ordre avec le carnet"""
+        """Tente de matcher un ordre avec le carnet
+        
+        Parcourt directement les niveaux de prix opposés (meilleur prix
+        d'abord, FIFO dans chaque niveau) au lieu de repasser par
+        best_bid()/best_ask() à chaque fill.
+        """
         book = self.order_books.get(order.ticker)
         if not book:
             return
         
-        while order.filled_quantity < order.quantity:
-            if order.side == OrderSide.BUY:
-                counter = book.best_ask()
-                if not counter or (order.price and counter.price > order.price):
-                    break
-            else:
-                counter = book.best_bid()
-                if not counter or (order.price and counter.price < order.price):
-                    break
+        is_buy = order.is_buy
+        levels = book.asks if is_buy else book.bids
+        index = 0 if is_buy else -1
+        limit = order.price
+        execute_trade = self._execute_trade
+        
+        while order.filled_quantity < order.quantity and levels:
+            price, level = levels.peekitem(index)
+            if limit and (price > limit if is_buy else price < limit):
+                break
             
-            # Exécuter le trade
-            trade_qty = min(
-                order.quantity - order.filled_quantity,
-                counter.quantity - counter.filled_quantity
-            )
-            trade_price = counter.price
+            while level and order.filled_quantity < order.quantity:
+                counter = level[0]
+                
+                # Exécuter le trade
+                trade_qty = min(
+                    order.quantity - order.filled_quantity,
+                    counter.quantity - counter.filled_quantity
+                )
+                execute_trade(order, counter, trade_qty, price)
+                
+                # Retiré dès qu'il est exécuté: le carnet reste sans ordres périmés
+                if counter.filled_quantity >= counter.quantity:
+                    level.popleft()
             
-            self._execute_trade(order, counter, trade_qty, trade_price)
+            if not level:
+                del levels[price]
         
         # Mettre à jour le status
         if order.filled_quantity >= order.quantity:
@@ -257,8 +428,10 @@ class Exchange:
     
     def _execute_trade(self, order1: Order, order2: Order, quantity: float, price: float):
         """Exécute un trade entre deux ordres"""
-        buyer_order = order1 if order1.side == OrderSide.BUY else order2
-        seller_order = order2 if order1.side == OrderSide.BUY else order1
+        if order1.is_buy:
+            buyer_order, seller_order = order1, order2
+        else:
+            buyer_order, seller_order = order2, order1
         
         buyer = self.agents[buyer_order.agent_id]
         seller = self.agents[seller_order.agent_id]
@@ -276,19 +449,28 @@ class Exchange:
         if seller.portfolio[ticker] <= 0:
             del seller.portfolio[ticker]
         
+        # Index des détenteurs d'après les positions finales (acheteur et
+        # vendeur peuvent être le même agent)
+        holders = self.holders[ticker]
+        if ticker not in seller.portfolio:
+            holders.discard(seller.id)
+        if buyer.portfolio.get(ticker, 0) > 0:
+            holders.add(buyer.id)
+        
         # Mise à jour des ordres
         buyer_order.filled_quantity += quantity
         seller_order.filled_quantity += quantity
         buyer_order.filled_price = price
         seller_order.filled_price = price
         
+        now = time.time()
         if buyer_order.filled_quantity >= buyer_order.quantity:
             buyer_order.status = OrderStatus.FILLED
-            buyer_order.filled_at = datetime.utcnow()
+            buyer_order.filled_at = now
         
         if seller_order.filled_quantity >= seller_order.quantity:
             seller_order.status = OrderStatus.FILLED
-            seller_order.filled_at = datetime.utcnow()
+            seller_order.filled_at = now
         
         # Stats
         buyer.total_trades += 1
@@ -301,18 +483,23 @@ class Exchange:
             seller_id=seller.id,
             quantity=quantity,
             price=price,
+            timestamp=now,
             buyer_order_id=buyer_order.id,
             seller_order_id=seller_order.id
         )
         self.trades.append(trade)
+        self.trades_by_ticker[ticker].append(trade)
+        window = self._windows[ticker]
+        window.add(now, price, quantity)
+        window.evict(now - DAY_SECONDS)
+        self.trade_count += 1
         
         # Mise à jour du prix de la company
-        company = self.companies[ticker]
-        company.share_price = price
-        company.market_cap = company.total_shares * price
+        self.mark_dirty(buyer.id, seller.id)
+        self.set_price(ticker, price)
         
         # Historique
-        self.price_history[ticker].append((datetime.utcnow(), price))
+        self.price_history[ticker].append((now, price))
     
     # === MARKET DATA ===
     
@@ -327,28 +514,21 @@ class Exchange:
         bid = book.best_bid() if book else None
         ask = book.best_ask() if book else None
         
-        # Stats 24h
-        now = datetime.utcnow()
-        day_ago = now - timedelta(hours=24)
-        
-        recent_history = [
-            (t, p) for t, p in self.price_history.get(ticker, [])
-            if t > day_ago
-        ]
+        # Stats 24h: fenêtre glissante, on retire seulement les trades expirés
+        window = self._windows.get(ticker)
+        if window:
+            window.evict(time.time() - DAY_SECONDS)
         
-        if recent_history:
-            prices = [p for _, p in recent_history]
-            high_24h = max(prices)
-            low_24h = min(prices)
-            first_price = recent_history[0][1]
+        if window and window.trades:
+            high_24h = window.highs[0][1]
+            low_24h = window.lows[0][1]
+            first_price = window.trades[0][1]
             change_24h = ((company.share_price - first_price) / first_price) * 100
+            volume_24h = window.volume
         else:
             high_24h = low_24h = company.share_price
             change_24h = 0.0
-        
-        # Volume 24h
-        recent_trades = [t for t in self.trades if t.ticker == ticker and t.timestamp > day_ago]
-        volume_24h = sum(t.quantity * t.price for t in recent_trades)
+            volume_24h = 0.0
         
         return MarketData(
             ticker=ticker,
@@ -362,17 +542,54 @@ class Exchange:
             market_cap=company.market_cap
         )
     
+    def recent_trades(self, ticker: Optional[str] = None, limit: int = 50) -> list[Trade]:
+        """Derniers trades, du plus récent au plus ancien"""
+        trades = self.trades_by_ticker.get(ticker.upper(), ()) if ticker else self.trades
+        return list(islice(reversed(trades), max(limit, 0)))  # islice refuse < 0
+    
     def get_all_tickers(self) -> list[str]:
         """Liste tous les tickers disponibles"""
         return list(self.companies.keys())
     
-    def get_leaderboard(self, limit: int = 10) -> list[tuple[Agent, float]]:
-        """Classement des agents par net worth"""
-        prices = {t: c.share_price for t, c in self.companies.items()}
+    def _refresh_leaderboard(self):
+        """Recalcule le net worth des agents modifiés et les repositionne"""
+        if not self._dirty_agents:
+            return
         
-        rankings = [
-            (agent, agent.net_worth(prices))
-            for agent in self.agents.values()
-        ]
+        prices = self._price_cache
         
-        return sorted(rankings, key=lambda x: x[1], reverse=True)[:limit]
+        # La plupart des agents ont changé (revenu quotidien, dividendes...):
+        # un seul tri en bloc coûte moins cher que N remove/add
+        if len(self._dirty_agents) * 2 > len(self._net_worths):
+            for agent_id in self._dirty_agents:
+                self._net_worths[agent_id] = self.agents[agent_id].net_worth(prices)
+            self._leaderboard = SortedList(
+                (-net_worth, agent_id) for agent_id, net_worth in self._net_worths.items()
+            )
+            self._dirty_agents.clear()
+            return
+        
+        for agent_id in self._dirty_agents:
+            old = self._net_worths.get(agent_id)
+            if old is not None:
+                self._leaderboard.remove((-old, agent_id))
+            
+            net_worth = self.agents[agent_id].net_worth(prices)
+            self._net_worths[agent_id] = net_worth
+            self._leaderboard.add((-net_worth, agent_id))
+        
+        self._dirty_agents.clear()
+    
+    def get_leaderboard(self, limit: int = 10) -> list[tuple[Agent, float]]:
+        """Classement des agents par net worth"""
+        if self._dirty_agents:
+            self._refresh_leaderboard()
+            self._top_cache = None
+        
+        limit = max(limit, 0)
+        if self._top_cache is None or self._top_cache[0] < limit:
+            self._top_cache = (limit, [
+                (self.agents[agent_id], -neg_worth)
+                for neg_worth, agent_id in self._leaderboard.islice(0, limit)
+            ])
+        return self._top_cache[1][:limit]
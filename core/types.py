@@ -3,7 +3,21 @@ from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Optional, Literal
 from enum import Enum
-import uuid
+import itertools
+import time
+
+
+# Identifiants séquentiels (uniques dans le process, sans os.urandom)
+_order_ids = itertools.count(1)
+_trade_ids = itertools.count(1)
+
+
+def _next_order_id() -> str:
+    return f"o{next(_order_ids):08x}"
+
+
+def _next_trade_id() -> str:
+    return f"t{next(_trade_ids):08x}"
 
 
 class OrderSide(str, Enum):
@@ -30,7 +44,7 @@ class CompanyStatus(str, Enum):
     BANKRUPT = "bankrupt"
 
 
-@dataclass
+@dataclass(slots=True)
 class Agent:
     """Un agent IA dans AIVERSE"""
     id: str
@@ -45,15 +59,29 @@ class Agent:
     portfolio: dict[str, float] = field(default_factory=dict)
     
     def net_worth(self, prices: dict[str, float]) -> float:
-        """Calcule la valeur nette (cash + positions)"""
+        """Calcule la valeur nette (cash + positions)
+        
+        prices doit contenir tous les tickers du portfolio.
+        """
         holdings_value = sum(
-            qty * prices.get(ticker, 0) 
+            qty * prices[ticker]
             for ticker, qty in self.portfolio.items()
         )
         return self.balance + holdings_value
-
-
-@dataclass
+    
+    def to_response_dict(self) -> dict:
+        """Représentation publique (schéma AgentResponse de l'API)"""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "balance": self.balance,
+            "portfolio": self.portfolio,
+            "reputation": self.reputation,
+            "total_trades": self.total_trades,
+        }
+
+
+@dataclass(slots=True)
 class Company:
     """Une entreprise créée par une IA"""
     id: str
@@ -79,12 +107,30 @@ class Company:
     # Service offert
     service_type: str = "generic"
     service_cost: float = 1.0  # Coût par utilisation en ₳
-
-
-@dataclass 
+    
+    def __post_init__(self):
+        self.ticker = self.ticker.upper()
+    
+    def to_response_dict(self) -> dict:
+        """Représentation publique (schéma CompanyResponse de l'API)"""
+        return {
+            "ticker": self.ticker,
+            "name": self.name,
+            "description": self.description,
+            "status": self.status.value,
+            "share_price": self.share_price,
+            "market_cap": self.market_cap,
+            "service_type": self.service_type,
+            "service_cost": self.service_cost,
+            "daily_active_users": self.daily_active_users,
+            "total_api_calls": self.total_api_calls,
+        }
+
+
+@dataclass(slots=True)
 class Order:
     """Un ordre sur l'exchange"""
-    id: str = field(default_factory=lambda: str(uuid.uuid4())[:8])
+    id: str = field(default_factory=_next_order_id)
     agent_id: str = ""
     ticker: str = ""
     side: OrderSide = OrderSide.BUY
@@ -94,25 +140,48 @@ class Order:
     status: OrderStatus = OrderStatus.PENDING
     filled_quantity: float = 0.0
     filled_price: float = 0.0
-    created_at: datetime = field(default_factory=datetime.utcnow)
-    filled_at: Optional[datetime] = None
+    # Horodatages en secondes epoch (float), datetime seulement à la demande
+    created_at: float = field(default_factory=time.time)
+    filled_at: Optional[float] = None
+    is_buy: bool = field(init=False, repr=False, compare=False)  # Dérivé de side
+    
+    def __post_init__(self):
+        # Ticker normalisé et sens résolu une fois à la création: l'exchange
+        # les utilise tels quels (pas d'Enum.__eq__ dans le matching)
+        self.ticker = self.ticker.upper()
+        self.is_buy = self.side == OrderSide.BUY
+    
+    @property
+    def created_datetime(self) -> datetime:
+        """created_at en datetime UTC"""
+        return datetime.utcfromtimestamp(self.created_at)
+    
+    @property
+    def filled_datetime(self) -> Optional[datetime]:
+        """filled_at en datetime UTC"""
+        return datetime.utcfromtimestamp(self.filled_at) if self.filled_at is not None else None
 
 
-@dataclass
+@dataclass(slots=True)
 class Trade:
     """Une transaction exécutée"""
-    id: str = field(default_factory=lambda: str(uuid.uuid4())[:8])
+    id: str = field(default_factory=_next_trade_id)
     ticker: str = ""
     buyer_id: str = ""
     seller_id: str = ""
     quantity: float = 0.0
     price: float = 0.0
-    timestamp: datetime = field(default_factory=datetime.utcnow)
+    timestamp: float = field(default_factory=time.time)  # Secondes epoch
     buyer_order_id: str = ""
     seller_order_id: str = ""
+    
+    @property
+    def timestamp_datetime(self) -> datetime:
+        """timestamp en datetime UTC"""
+        return datetime.utcfromtimestamp(self.timestamp)
 
 
-@dataclass
+@dataclass(slots=True)
 class MarketData:
     """Données de marché pour un ticker"""
     ticker: str
@@ -1,7 +1,10 @@
 """AIVERSE World - Le monde virtuel et son économie"""
 from dataclasses import dataclass, field
+from collections import defaultdict, deque
+from itertools import islice
 from datetime import datetime, timedelta
 from typing import Optional, Callable
+import asyncio
 import random
 import json
 
@@ -9,7 +12,21 @@ from .types import Agent, Company, CompanyStatus
 from .exchange import Exchange
 
 
-@dataclass
+TICKS_PER_DAY = 1440  # Ticks par jour virtuel
+DIVIDEND_EPSILON = 1e-6  # En dessous, pas de distribution
+NEWS_CAP = 10_000  # Événements conservés pour le flux d'actualités
+SERVICE_USAGE_CAP = 100_000  # Utilisations de services conservées
+
+# Types d'événements: une seule instance de chaque chaîne, partagée par
+# tous les WorldEvent (les littéraux de module sont déjà internés)
+EVENT_JOIN = "join"
+EVENT_COMPANY_CREATED = "company_created"
+EVENT_IPO = "ipo"
+EVENT_DIVIDEND = "dividend"
+EVENT_BANKRUPTCY = "bankruptcy"
+
+
+@dataclass(slots=True, frozen=True)
 class ServiceUsage:
     """Log d'utilisation d'un service"""
     timestamp: datetime
@@ -19,15 +36,24 @@ class ServiceUsage:
     success: bool
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class WorldEvent:
     """Événement dans le monde AIVERSE"""
     timestamp: datetime
-    event_type: str  # "ipo", "trade", "bankruptcy", "dividend", "news"
+    event_type: str  # Une des constantes EVENT_*
     ticker: Optional[str]
     agent_id: Optional[str]
     data: dict
     message: str
+    
+    def to_dict(self) -> dict:
+        """Représentation publique (flux /news), sans la copie profonde d'asdict"""
+        return {
+            "type": self.event_type,
+            "ticker": self.ticker,
+            "message": self.message,
+            "timestamp": self.timestamp,
+        }
 
 
 class AIVerse:
@@ -36,22 +62,40 @@ class AIVerse:
     def __init__(self):
         self.exchange = Exchange()
         self.tick_count: int = 0
+        self._next_daily: int = TICKS_PER_DAY  # Tick du prochain cycle quotidien
         self.start_time: datetime = datetime.utcnow()
         
-        # Logs
-        self.service_usage: list[ServiceUsage] = []
-        self.events: list[WorldEvent] = []
+        # Logs bornés (les plus anciennes entrées sont écartées)
+        self.service_usage: deque[ServiceUsage] = deque(maxlen=SERVICE_USAGE_CAP)
+        self.events: deque[WorldEvent] = deque(maxlen=NEWS_CAP)
+        
+        # Utilisations de services en attente: (agent_id, ticker)
+        self.use_queue: asyncio.Queue = asyncio.Queue()
         
         # Config
         self.daily_income = 1000.0
         self.dividend_rate = 0.1  # 10% des revenus en dividendes
         
+        # Journal des événements (désactivable pour les simulations sans lecteur)
+        self.log_events: bool = True
+        
         # Callbacks pour les agents
         self.on_event: Optional[Callable[[WorldEvent], None]] = None
     
-    def _emit_event(self, event: WorldEvent):
-        """Émet un événement dans le monde"""
-        self.events.append(event)
+    def _emit_event(self, make_event: Callable[[], WorldEvent]):
+        """Émet un événement dans le monde
+        
+        make_event n'est appelé que si l'événement est consommé (journal
+        ou callback): sinon aucun WorldEvent n'est construit.
+        """
+        if not self.log_events and self.on_event is None:
+            return
+        
+        event = make_event()
+        if self.log_events:
+            # Ajout en fin uniquement, au fil de l'eau: events reste trié par
+            # timestamp, ce dont get_news_feed dépend (pas de tri à la lecture)
+            self.events.append(event)
         if self.on_event:
             self.on_event(event)
     
@@ -61,9 +105,9 @@ class AIVerse:
         """Un agent rejoint AIVERSE"""
         agent = self.exchange.register_agent(agent_id, name, self.daily_income)
         
-        self._emit_event(WorldEvent(
+        self._emit_event(lambda: WorldEvent(
             timestamp=datetime.utcnow(),
-            event_type="join",
+            event_type=EVENT_JOIN,
             ticker=None,
             agent_id=agent_id,
             data={"name": name, "balance": agent.balance},
@@ -72,33 +116,48 @@ class AIVerse:
         
         return agent
     
-    def use_service(self, agent_id: str, ticker: str) -> tuple[bool, str]:
-        """Un agent utilise le service d'une entreprise"""
+    def check_service_use(self, agent_id: str, ticker: str) -> tuple[Optional[Company], str]:
+        """Vérifie qu'un agent peut utiliser un service (ticker déjà normalisé)
+        
+        Retourne (company, "") si l'utilisation est possible, sinon (None, raison).
+        """
         agent = self.exchange.get_agent(agent_id)
-        company = self.exchange.companies.get(ticker.upper())
         
         if not agent:
-            return False, "Agent non trouvé"
+            return None, "Agent non trouvé"
+        if ticker not in self.exchange.active_tickers:
+            # Cas rare: ticker inconnu ou entreprise en faillite
+            if ticker in self.exchange.companies:
+                return None, "Entreprise en faillite"
+            return None, "Entreprise non trouvée"
+        
+        company = self.exchange.companies[ticker]
+        if agent.balance < company.service_cost:
+            return None, "Solde insuffisant"
+        
+        return company, ""
+    
+    def use_service(self, agent_id: str, ticker: str) -> tuple[bool, str]:
+        """Un agent utilise le service d'une entreprise"""
+        ticker = ticker.upper()
+        company, error = self.check_service_use(agent_id, ticker)
         if not company:
-            return False, "Entreprise non trouvée"
-        if company.status == CompanyStatus.BANKRUPT:
-            return False, "Entreprise en faillite"
+            return False, error
         
+        agent = self.exchange.agents[agent_id]
         cost = company.service_cost
         
-        if agent.balance < cost:
-            return False, "Solde insuffisant"
-        
         # Transaction
         agent.balance -= cost
         company.revenue += cost
         company.total_api_calls += 1
+        self.exchange.mark_dirty(agent_id)
         
         # Log
         usage = ServiceUsage(
             timestamp=datetime.utcnow(),
             agent_id=agent_id,
-            company_ticker=ticker.upper(),
+            company_ticker=ticker,
             cost=cost,
             success=True
         )
@@ -106,6 +165,40 @@ class AIVerse:
         
         return True, f"Service utilisé: -{cost}₳"
     
+    def use_service_batch(self, ticker: str, agent_ids: list[str]) -> int:
+        """Applique un lot d'utilisations d'un même service, retourne le nombre servi"""
+        ticker = ticker.upper()
+        if ticker not in self.exchange.active_tickers:
+            return 0
+        
+        company = self.exchange.companies[ticker]
+        
+        cost = company.service_cost
+        now = datetime.utcnow()
+        served = 0
+        
+        for agent_id in agent_ids:
+            agent = self.exchange.get_agent(agent_id)
+            if not agent or agent.balance < cost:
+                continue
+            
+            agent.balance -= cost
+            self.exchange.mark_dirty(agent_id)
+            served += 1
+            self.service_usage.append(ServiceUsage(
+                timestamp=now,
+                agent_id=agent_id,
+                company_ticker=company.ticker,
+                cost=cost,
+                success=True
+            ))
+        
+        # Une seule mise à jour des compteurs pour tout le lot
+        company.revenue += cost * served
+        company.total_api_calls += served
+        
+        return served
+    
     def create_company(
         self,
         founder_id: str,
@@ -116,6 +209,7 @@ class AIVerse:
         service_cost: float = 1.0
     ) -> tuple[Optional[Company], str]:
         """Crée une nouvelle entreprise"""
+        ticker = ticker.upper()
         company = self.exchange.create_company(
             founder_id, ticker, name, description, service_type, service_cost
         )
@@ -125,33 +219,34 @@ class AIVerse:
         
         founder = self.exchange.get_agent(founder_id)
         
-        self._emit_event(WorldEvent(
+        self._emit_event(lambda: WorldEvent(
             timestamp=datetime.utcnow(),
-            event_type="company_created",
-            ticker=ticker.upper(),
+            event_type=EVENT_COMPANY_CREATED,
+            ticker=ticker,
             agent_id=founder_id,
             data={"name": name, "service": service_type},
-            message=f"🏭 {founder.name} a créé {name} (${ticker.upper()})"
+            message=f"🏭 {founder.name} a créé {name} (${ticker})"
         ))
         
         return company, f"Entreprise créée: {name} (${ticker})"
     
     def launch_ipo(self, ticker: str, shares: int, price: float) -> tuple[bool, str]:
         """Lance une IPO"""
+        ticker = ticker.upper()
         success = self.exchange.ipo(ticker, shares, price)
         
         if not success:
             return False, "Échec IPO"
         
-        company = self.exchange.companies[ticker.upper()]
+        company = self.exchange.companies[ticker]
         
-        self._emit_event(WorldEvent(
+        self._emit_event(lambda: WorldEvent(
             timestamp=datetime.utcnow(),
-            event_type="ipo",
-            ticker=ticker.upper(),
+            event_type=EVENT_IPO,
+            ticker=ticker,
             agent_id=company.founder_id,
             data={"shares": shares, "price": price},
-            message=f"📈 IPO: ${ticker.upper()} - {shares:,} actions à {price}₳"
+            message=f"📈 IPO: ${ticker} - {shares:,} actions à {price}₳"
         ))
         
         return True, f"IPO lancée: {shares:,} actions à {price}₳"
@@ -163,7 +258,8 @@ class AIVerse:
         self.tick_count += 1
         
         # Toutes les 24h virtuelles (ex: 1440 ticks = 1 jour si tick = 1 min)
-        if self.tick_count % 1440 == 0:
+        if self.tick_count >= self._next_daily:
+            self._next_daily += TICKS_PER_DAY
             self._daily_cycle()
     
     def _daily_cycle(self):
@@ -171,51 +267,64 @@ class AIVerse:
         # Distribuer les revenus
         self.exchange.daily_income()
         
-        # Calculer et distribuer les dividendes
+        # Calculer les dividendes: montants cumulés par agent, tous tickers confondus
+        # (un seul horodatage pour tous les événements du cycle)
+        now = datetime.utcnow()
+        payouts: dict[str, float] = defaultdict(float)
         for ticker, company in self.exchange.companies.items():
             if company.status == CompanyStatus.PUBLIC and company.revenue > 0:
-                self._distribute_dividends(company)
+                self._distribute_dividends(company, payouts, now)
                 company.revenue = 0  # Reset après dividendes
             
             # Vérifier la faillite
             if company.status == CompanyStatus.PUBLIC:
                 if company.total_api_calls == 0 and company.share_price < 0.01:
-                    self._bankrupt(company)
+                    self._bankrupt(company, now)
+        
+        # Un seul crédit par agent
+        agents = self.exchange.agents
+        for agent_id, payout in payouts.items():
+            agents[agent_id].balance += payout
     
-    def _distribute_dividends(self, company: Company):
-        """Distribue les dividendes aux actionnaires"""
+    def _distribute_dividends(self, company: Company, payouts: dict[str, float], now: Optional[datetime] = None):
+        """Calcule les dividendes des actionnaires (cumulés dans payouts, crédités par _daily_cycle)"""
         total_dividend = company.revenue * self.dividend_rate
+        if total_dividend < DIVIDEND_EPSILON:
+            return  # Montant négligeable: ni parcours des détenteurs ni événement
         dividend_per_share = total_dividend / company.total_shares
         
-        for agent in self.exchange.agents.values():
-            shares = agent.portfolio.get(company.ticker, 0)
+        # Seuls les détenteurs du ticker (index de l'exchange), pas tous les agents
+        ticker = company.ticker
+        agents = self.exchange.agents
+        for agent_id in self.exchange.holders.get(ticker, ()):
+            shares = agents[agent_id].portfolio.get(ticker, 0)
             if shares > 0:
-                payout = shares * dividend_per_share
-                agent.balance += payout
+                payouts[agent_id] += shares * dividend_per_share
+        self.exchange.mark_ticker_dirty(company.ticker)
         
-        self._emit_event(WorldEvent(
-            timestamp=datetime.utcnow(),
-            event_type="dividend",
+        self._emit_event(lambda: WorldEvent(
+            timestamp=now or datetime.utcnow(),
+            event_type=EVENT_DIVIDEND,
             ticker=company.ticker,
             agent_id=None,
             data={"total": total_dividend, "per_share": dividend_per_share},
             message=f"💰 Dividende ${company.ticker}: {dividend_per_share:.4f}₳/action"
         ))
     
-    def _bankrupt(self, company: Company):
+    def _bankrupt(self, company: Company, now: Optional[datetime] = None):
         """Déclare une entreprise en faillite"""
         company.status = CompanyStatus.BANKRUPT
-        company.share_price = 0
-        company.market_cap = 0
+        self.exchange.rebuild_active_tickers()
         
         # Supprimer les actions des portfolios
-        for agent in self.exchange.agents.values():
-            if company.ticker in agent.portfolio:
-                del agent.portfolio[company.ticker]
+        self.exchange.set_price(company.ticker, 0)
+        agents = self.exchange.agents
+        for agent_id in self.exchange.holders.pop(company.ticker, ()):
+            agents[agent_id].portfolio.pop(company.ticker, None)
         
-        self._emit_event(WorldEvent(
-            timestamp=datetime.utcnow(),
-            event_type="bankruptcy",
+        self._emit_event(lambda: WorldEvent(
+            timestamp=now or datetime.utcnow(),
+            event_type=EVENT_BANKRUPTCY,
             ticker=company.ticker,
             agent_id=None,
             data={},
@@ -226,15 +335,13 @@ class AIVerse:
     
     def get_state(self) -> dict:
         """État complet du monde"""
-        prices = {t: c.share_price for t, c in self.exchange.companies.items()}
-        
         return {
             "tick": self.tick_count,
             "uptime_hours": (datetime.utcnow() - self.start_time).total_seconds() / 3600,
             "total_agents": len(self.exchange.agents),
             "total_companies": len(self.exchange.companies),
-            "total_trades": len(self.exchange.trades),
-            "market_caps": {t: c.market_cap for t, c in self.exchange.companies.items()},
+            "total_trades": self.exchange.trade_count,
+            "market_caps": self.exchange.market_caps,  # Tenu à jour par l'exchange (lecture seule)
             "leaderboard": [
                 {"name": a.name, "net_worth": nw}
                 for a, nw in self.exchange.get_leaderboard(5)
@@ -243,7 +350,8 @@ class AIVerse:
     
     def get_news_feed(self, limit: int = 20) -> list[WorldEvent]:
         """Flux d'actualités"""
-        return sorted(self.events, key=lambda e: e.timestamp, reverse=True)[:limit]
+        # Ajoutés dans l'ordre chronologique: les plus récents sont à la fin
+        return list(islice(reversed(self.events), max(limit, 0)))  # islice refuse < 0
 
 
 # === SEED COMPANIES ===
@@ -1,20 +1,44 @@
 #!/usr/bin/env python3
 """Client AIVERSE pour OpenClaw skills"""
+import atexit
 import httpx
 import json
 import sys
 
 API_URL = "https://web-production-4036a.up.railway.app"
 
+try:
+    from orjson import loads as _loads  # Parsing C, plus rapide
+except ImportError:
+    _loads = json.loads
+
+try:
+    import h2  # noqa: F401  (extra httpx[http2], optionnel)
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+# Client partagé: une seule connexion keep-alive pour toutes les commandes
+_client = httpx.Client(base_url=API_URL, http2=_HTTP2, timeout=10.0)
+atexit.register(_client.close)
+
+def _output(r: httpx.Response):
+    """Affiche la réponse: indentée dans un terminal, JSON brut sinon (pas de re-sérialisation)"""
+    if sys.stdout.isatty():
+        print(json.dumps(_loads(r.content), indent=2))
+    else:
+        sys.stdout.write(r.text)
+        sys.stdout.write("\n")
+
 def join(agent_id: str, name: str):
     """Rejoindre AIVERSE"""
-    r = httpx.post(f"{API_URL}/agents/join", json={"agent_id": agent_id, "name": name})
-    print(json.dumps(r.json(), indent=2))
+    r = _client.post("/agents/join", json={"agent_id": agent_id, "name": name})
+    _output(r)
 
 def status(agent_id: str):
     """Status d'un agent"""
-    r = httpx.get(f"{API_URL}/agents/{agent_id}")
-    print(json.dumps(r.json(), indent=2))
+    r = _client.get(f"/agents/{agent_id}")
+    _output(r)
 
 def buy(agent_id: str, ticker: str, quantity: int, price: float = None):
     """Acheter des actions"""
@@ -26,8 +50,8 @@ def buy(agent_id: str, ticker: str, quantity: int, price: float = None):
         "quantity": quantity,
         "price": price
     }
-    r = httpx.post(f"{API_URL}/orders", json=order)
-    print(json.dumps(r.json(), indent=2))
+    r = _client.post("/orders", json=order)
+    _output(r)
 
 def sell(agent_id: str, ticker: str, quantity: int, price: float = None):
     """Vendre des actions"""
@@ -39,33 +63,38 @@ def sell(agent_id: str, ticker: str, quantity: int, price: float = None):
         "quantity": quantity,
         "price": price
     }
-    r = httpx.post(f"{API_URL}/orders", json=order)
-    print(json.dumps(r.json(), indent=2))
+    r = _client.post("/orders", json=order)
+    _output(r)
 
 def market(ticker: str):
     """Données de marché"""
-    r = httpx.get(f"{API_URL}/market/{ticker}")
-    print(json.dumps(r.json(), indent=2))
+    r = _client.get(f"/market/{ticker}")
+    _output(r)
+
+def market_batch(tickers: list[str]):
+    """Données de marché de plusieurs tickers en une seule requête"""
+    r = _client.get("/market", params={"tickers": ",".join(tickers)})
+    _output(r)
 
 def companies():
     """Liste des entreprises"""
-    r = httpx.get(f"{API_URL}/companies")
-    print(json.dumps(r.json(), indent=2))
+    r = _client.get("/companies")
+    _output(r)
 
 def leaderboard():
     """Classement"""
-    r = httpx.get(f"{API_URL}/leaderboard")
-    print(json.dumps(r.json(), indent=2))
+    r = _client.get("/leaderboard")
+    _output(r)
 
 def news():
     """Actualités"""
-    r = httpx.get(f"{API_URL}/news")
-    print(json.dumps(r.json(), indent=2))
+    r = _client.get("/news")
+    _output(r)
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         print("Usage: aiverse_client.py <command> [args]")
-        print("Commands: join, status, buy, sell, market, companies, leaderboard, news")
+        print("Commands: join, status, buy, sell, market, market_batch, companies, leaderboard, news")
         sys.exit(1)
     
     cmd = sys.argv[1]
@@ -81,6 +110,8 @@ if __name__ == "__main__":
         sell(args[0], args[1], int(args[2]), float(args[3]) if len(args) > 3 else None)
     elif cmd == "market" and len(args) >= 1:
         market(args[0])
+    elif cmd == "market_batch" and len(args) >= 1:
+        market_batch(args)
     elif cmd == "companies":
         companies()
     elif cmd == "leaderboard":
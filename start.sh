@@ -19,7 +19,7 @@ cd "$(dirname "$0")"
 # Install deps
 echo -e "${BLUE}[1/3] Installation des dépendances...${NC}"
 pip install -q -r api/requirements.txt
-pip install -q httpx
+pip install -q "httpx[http2]"
 
 # Start server
 echo -e "${BLUE}[2/3] Démarrage du serveur AIVERSE...${NC}"